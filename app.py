@@ -1,12 +1,17 @@
 import streamlit as st
 import os
+import re
 import tempfile
+import shutil
+import hashlib
+import json
 import io
-from pydub import AudioSegment
-from pydub.effects import normalize
-import time
-import requests
-from requests.auth import HTTPBasicAuth
+import wave
+import subprocess
+import threading
+from contextlib import contextmanager
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure page
 st.set_page_config(
@@ -20,26 +25,74 @@ BELL_FILES_DIR = "bell_files"
 if not os.path.exists(BELL_FILES_DIR):
     os.makedirs(BELL_FILES_DIR)
 
-def get_available_bell_files():
+# Decoded copies of library bell files are kept next to them so they survive restarts
+DECODED_BELLS_DIR = os.path.join(BELL_FILES_DIR, ".decoded")
+os.makedirs(DECODED_BELLS_DIR, exist_ok=True)
+# Version part of a decoded copy's name: "<mtime_ns>-<size>", or just the whole-second mtime for older copies
+DECODED_BELL_VERSION = re.compile(r'\d+(-\d+)?')
+
+# Processed outputs are kept here between runs
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "bell_music_creator_cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+# The oldest outputs are removed once the cache grows past this size
+MAX_CACHE_BYTES = 500 * 1024 * 1024
+
+# Algo 8301 upload settings
+ALGO_CONFIG_FILE = "algo_config.json"
+
+# Upload limits
+SUPPORTED_EXTENSIONS = frozenset({"mp3", "wav"})
+MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+
+# Characters not allowed in output file names
+UNSAFE_FILENAME_CHARS = re.compile(r'[^\w.-]')
+
+# Output encoding settings
+MP3_BITRATE = "192k"
+# LAME algorithm quality 7 (0 = best, 9 = fastest) roughly halves encode time at a fixed bitrate
+MP3_QUALITY_ARGS = ["-compression_level", "7"]
+MP3_ENCODER_ARGS = ["-c:a", "libmp3lame", "-b:a", MP3_BITRATE, *MP3_QUALITY_ARGS]
+OUTPUT_AUDIO_FORMAT = "aformat=sample_fmts=s16:sample_rates=44100:channel_layouts=stereo"
+# Length in seconds of the inaudible fade that ends the music at silence when no fade out is chosen
+SPLICE_FADE_DURATION = 0.01
+# Enough of a WAV file to hold its fmt and data chunk headers
+WAV_HEADER_BYTES = 64 * 1024
+
+@st.cache_data(show_spinner=False)
+def get_available_bell_files(directory_mtime):
     """Get list of available bell files"""
+    # directory_mtime is only the cache key: it changes whenever a bell file is added or removed
     bell_files = []
     if os.path.exists(BELL_FILES_DIR):
-        for file in os.listdir(BELL_FILES_DIR):
-            if file.lower().endswith(('.mp3', '.wav')):
-                bell_files.append(file)
+        # scandir gets the file type from the directory listing, without a stat per entry
+        with os.scandir(BELL_FILES_DIR) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(('.mp3', '.wav')):
+                    bell_files.append(entry.name)
     return sorted(bell_files)
 
 def save_bell_file(uploaded_file):
     """Save uploaded bell file to bell files directory"""
     file_path = os.path.join(BELL_FILES_DIR, uploaded_file.name)
+    uploaded_file.seek(0)
     with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+        shutil.copyfileobj(uploaded_file, f, length=1 << 20)
+    
+    # Decode the bell in the background so the first run that uses it does not have to.
+    # Any error is left in the discarded future: the bell is decoded again on first use, where it is shown
+    bell_stat = os.stat(file_path)
+    get_processing_executor().submit(load_bell_file, file_path, bell_stat.st_mtime_ns, bell_stat.st_size)
     return file_path
 
+@st.cache_data(show_spinner=False)
+def read_algo_config_file(config_mtime):
+    """Read the Algo 8301 configuration file once per version of the file"""
+    # config_mtime is only the cache key: it changes whenever the file is edited
+    with open(ALGO_CONFIG_FILE, 'r') as f:
+        return json.load(f)
+
 def load_algo_config():
     """Load Algo 8301 configuration from file"""
-    import json
-    config_file = "algo_config.json"
     default_config = {
         "enabled": False,
         "device_ip": "",
@@ -47,31 +100,66 @@ def load_algo_config():
         "password": ""
     }
     
-    if os.path.exists(config_file):
-        try:
-            with open(config_file, 'r') as f:
-                config = json.load(f)
-                print(f"DEBUG: Loaded config: enabled={config.get('enabled')}, ip={config.get('device_ip')}, has_password={bool(config.get('password'))}")
-                return config
-        except Exception as e:
-            print(f"DEBUG: Error loading config: {e}")
-            return default_config
-    else:
-        print(f"DEBUG: Config file not found at {os.path.abspath(config_file)}")
-    return default_config
-
-def convert_to_algo_mp3(audio_segment, filename):
-    """Convert AudioSegment to MP3 format for Algo 8301"""
-    # Convert to mono for compatibility
-    audio_mono = audio_segment.set_channels(1)
-    # Export as MP3
-    mp3_buffer = io.BytesIO()
-    audio_mono.export(mp3_buffer, format="mp3", bitrate="192k")
-    mp3_buffer.seek(0)
-    return mp3_buffer.getvalue()
+    try:
+        return read_algo_config_file(os.path.getmtime(ALGO_CONFIG_FILE))
+    except (OSError, ValueError):
+        return default_config
+
+def is_algo_upload_configured(algo_config):
+    """Check if uploading to the Algo 8301 is enabled and configured"""
+    return (algo_config.get('enabled', False) and
+            bool(algo_config.get('device_ip', '')) and
+            bool(algo_config.get('password', '')))
+
+def convert_to_algo_mp3(mp3_data):
+    """Convert processed MP3 data to mono MP3 format for Algo 8301"""
+    # Only used when processing did not already produce the mono copy
+    return run_ffmpeg([
+        find_binary("ffmpeg"), "-v", "error",
+        "-i", "pipe:0",
+        "-ac", "1",
+        *MP3_ENCODER_ARGS,
+        "-f", "mp3", "pipe:1"
+    ], mp3_data)
+
+class MultipartUploadBody:
+    """File-like multipart/form-data body that streams the audio from its buffer instead of copying it into a new one"""
+    
+    def __init__(self, field_name, filename, content_type, data):
+        self.boundary = os.urandom(16).hex()
+        head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode()
+        tail = f'\r\n--{self.boundary}--\r\n'.encode()
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self._parts = [memoryview(head), memoryview(data), memoryview(tail)]
+        self._length = sum(len(part) for part in self._parts)
+    
+    def __len__(self):
+        return self._length
+    
+    def read(self, size=-1):
+        chunks = []
+        while self._parts and size != 0:
+            part = self._parts[0]
+            take = len(part) if size < 0 else min(size, len(part))
+            chunks.append(part[:take])
+            if take == len(part):
+                self._parts.pop(0)
+            else:
+                self._parts[0] = part[take:]
+            if size > 0:
+                size -= take
+        return b"".join(chunks)
 
 def upload_to_algo8301(audio_data, filename, device_ip, username, password):
     """Upload audio file to Algo 8301 IP Paging Adapter"""
+    # Imported here so page renders that never upload skip loading requests
+    import requests
+    from requests.auth import HTTPBasicAuth
+    
     try:
         # Ensure filename has .mp3 extension
         if not filename.lower().endswith('.mp3'):
@@ -82,11 +170,11 @@ def upload_to_algo8301(audio_data, filename, device_ip, username, password):
         
         # Prepare the upload
         url = f"http://{device_ip}/api/files/upload"
-        files = {'file': (filename, audio_data, 'audio/mpeg')}
+        body = MultipartUploadBody('file', filename, 'audio/mpeg', audio_data)
         auth = HTTPBasicAuth(username, password)
         
-        # Upload with timeout
-        response = requests.post(url, files=files, auth=auth, timeout=30)
+        # Upload with timeout; the body is sent in chunks as it is read
+        response = requests.post(url, data=body, headers={'Content-Type': body.content_type}, auth=auth, timeout=30)
         
         if response.status_code == 200:
             return True, f"Successfully uploaded {filename} to Algo 8301"
@@ -100,123 +188,468 @@ def upload_to_algo8301(audio_data, filename, device_ip, username, password):
     except Exception as e:
         return False, f"Upload failed: {str(e)}"
 
+def make_output_filename(custom_filename):
+    """Turn a user-entered name into a safe MP3 file name"""
+    name, extension = os.path.splitext(custom_filename.strip())
+    if extension.lower() != ".mp3":
+        name = custom_filename.strip()
+    # Replace path separators and other unsafe characters
+    name = UNSAFE_FILENAME_CHARS.sub('_', name) or "Bell"
+    return f"{name}.mp3"
+
+def sniff_audio_format(header):
+    """Detect MP3 or WAV data from the first 12 bytes of a file"""
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return "wav"
+    # MP3 files start with an ID3 tag or straight with an MPEG frame sync
+    if header[:3] == b'ID3' or (len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
 def validate_audio_file(uploaded_file):
     """Validate if the uploaded file is a supported audio format"""
     if uploaded_file is None:
         return False, "No file uploaded"
     
     # Check file extension
-    file_extension = uploaded_file.name.lower().split('.')[-1]
-    supported_formats = ['mp3', 'wav']
+    file_extension = uploaded_file.name.rpartition('.')[2].lower()
     
-    if file_extension not in supported_formats:
+    if file_extension not in SUPPORTED_EXTENSIONS:
         return False, f"Unsupported file format. Please upload MP3 or WAV files only."
     
     # Check file size (limit to 100MB for practical purposes)
-    if uploaded_file.size > 100 * 1024 * 1024:
+    if uploaded_file.size > MAX_UPLOAD_BYTES:
         return False, "File size too large. Please upload files smaller than 100MB."
     
+    # Check file content, so a mislabelled file is rejected before FFmpeg runs
+    header = uploaded_file.read(12)
+    uploaded_file.seek(0)
+    if sniff_audio_format(header) is None:
+        return False, "File content is not valid MP3 or WAV audio."
+    
     return True, "Valid file"
 
-def process_audio_files(file1_data, file2_data, file1_name, file2_name, progress_bar, status_text, is_file2_from_library=False, crop_duration=180, fade_out_duration=2.0, trim_start=0, fade_in_duration=0.0):
+def get_validation_result(uploaded_file):
+    """Validate an uploaded file once and reuse the result on later reruns"""
+    # Validation checks the file's content, so key it by file_id: a new upload with the same name and size gets its own check
+    cache_key = f"validation_{uploaded_file.file_id}"
+    if cache_key not in st.session_state:
+        st.session_state[cache_key] = validate_audio_file(uploaded_file)
+    return st.session_state[cache_key]
+
+@st.cache_resource(show_spinner=False)
+def find_binary(name):
+    """Look up an FFmpeg tool on PATH once per server process"""
+    return shutil.which(name) or name
+
+def read_wav_info(wav_file):
+    """Read the format and duration of a PCM WAV file in-process, or None if the wave module can't parse it"""
+    try:
+        with wave.open(wav_file, "rb") as wav:
+            sample_width = wav.getsampwidth()
+            return {
+                "codec_name": "pcm_u8" if sample_width == 1 else f"pcm_s{sample_width * 8}le",
+                "sample_rate": str(wav.getframerate()),
+                "channels": wav.getnchannels(),
+                "duration": wav.getnframes() / wav.getframerate()
+            }
+    except (wave.Error, EOFError):
+        return None
+
+def run_ffmpeg(args, input_data=None, pass_fds=()):
+    """Run an FFmpeg/FFprobe command and return its output, raising on failure"""
+    result = subprocess.run(args, input=input_data, capture_output=True, pass_fds=pass_fds)
+    if result.returncode != 0:
+        error_lines = result.stderr.decode(errors="replace").strip().splitlines()
+        raise RuntimeError(error_lines[-1] if error_lines else f"{args[0]} exited with code {result.returncode}")
+    return result.stdout
+
+def sum_packet_durations(file_path, input_data=None):
+    """Get the exact duration of an audio file by adding up the durations of its packets"""
+    output = run_ffmpeg([
+        find_binary("ffprobe"), "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "packet=duration_time",
+        "-of", "csv=p=0",
+        file_path
+    ], input_data)
+    return sum(float(packet_duration) for packet_duration in output.split() if packet_duration != b"N/A")
+
+def probe_audio_file(file_path, input_data=None):
+    """Get the codec, sample rate, channel count and duration of an audio file using FFprobe"""
+    # PCM WAV headers already hold everything we need, so skip starting FFprobe for them
+    wav_info = None
+    if input_data is not None:
+        wav_header = bytes(input_data[:WAV_HEADER_BYTES])
+        if sniff_audio_format(wav_header[:12]) == "wav":
+            wav_info = read_wav_info(io.BytesIO(wav_header))
+    elif file_path.lower().endswith(".wav"):
+        wav_info = read_wav_info(file_path)
+    if wav_info is not None:
+        return wav_info
+    
+    output = run_ffmpeg([
+        find_binary("ffprobe"), "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name,sample_rate,channels:format=duration",
+        "-of", "json",
+        file_path
+    ], input_data)
+    probe = json.loads(output)
+    stream = probe["streams"][0] if probe.get("streams") else {}
+    
+    duration = probe["format"].get("duration", "N/A")
+    if duration == "N/A":
+        # Piped MP3s without a length header have no duration; a bitrate estimate would misplace the fade out on VBR files
+        duration = sum_packet_durations(file_path, input_data)
+    
+    return {
+        "codec_name": stream.get("codec_name"),
+        "sample_rate": stream.get("sample_rate"),
+        "channels": stream.get("channels"),
+        "duration": float(duration)
+    }
+
+@st.cache_data(show_spinner=False)
+def probe_library_bell(bell_file_path, mtime_ns, size):
+    """Probe a library bell file once per version of the file"""
+    # mtime_ns and size are part of the cache key so an edited bell file is probed again
+    return probe_audio_file(bell_file_path)
+
+def write_to_pipe(write_fd, data):
+    """Write data to a pipe and close it"""
+    try:
+        with open(write_fd, "wb") as pipe:
+            pipe.write(data)
+    except BrokenPipeError:
+        pass  # FFmpeg stopped reading early; its own error is reported by run_ffmpeg
+
+@contextmanager
+def pipe_input(data):
+    """Feed data to FFmpeg through an extra pipe and yield the file descriptor FFmpeg reads it from"""
+    read_fd, write_fd = os.pipe()
+    writer = threading.Thread(target=write_to_pipe, args=(write_fd, data), daemon=True)
+    writer.start()
+    try:
+        yield read_fd
+    finally:
+        # Closing the read end also unblocks the writer if FFmpeg never read everything
+        os.close(read_fd)
+        writer.join()
+
+def load_bell_file(bell_file_path, mtime_ns, size):
+    """Decode a library bell file once and return the path of the decoded WAV copy"""
+    # mtime_ns and size name the version, so a bell replaced within the same second is still decoded again
+    bell_file_name = os.path.basename(bell_file_path)
+    decoded_path = os.path.join(DECODED_BELLS_DIR, f"{bell_file_name}.{mtime_ns}-{size}.wav")
+    # Checked on every call rather than cached in memory, so a copy deleted from disk is decoded again
+    if os.path.exists(decoded_path):
+        return decoded_path  # Decoded when the bell was saved or by an earlier run
+    
+    # Remove copies decoded from older versions of this bell file
+    with os.scandir(DECODED_BELLS_DIR) as entries:
+        for entry in entries:
+            version = entry.name[len(bell_file_name) + 1:-len(".wav")]
+            if entry.name.startswith(f"{bell_file_name}.") and entry.name.endswith(".wav") and DECODED_BELL_VERSION.fullmatch(version):
+                os.unlink(entry.path)
+    
+    # A partial file of its own, so another server process decoding the same bell can't collide with it
+    with tempfile.NamedTemporaryFile(dir=DECODED_BELLS_DIR, suffix=".partial", delete=False) as partial_file:
+        partial_path = partial_file.name
+    try:
+        run_ffmpeg([
+            find_binary("ffmpeg"), "-v", "error", "-y",
+            "-i", bell_file_path,
+            "-af", OUTPUT_AUDIO_FORMAT,
+            "-c:a", "pcm_s16le",
+            "-f", "wav", partial_path
+        ])
+        os.replace(partial_path, decoded_path)
+    except Exception:
+        os.remove(partial_path)
+        raise
+    return decoded_path
+
+def build_filter_graph(music_duration, crop_duration, fade_out_duration, trim_start, fade_in_duration, include_algo_copy=False):
+    """Build the FFmpeg filter graph that trims, crops and fades the music and appends the bell"""
+    # Length of the music that is left once the start is trimmed and the rest cropped
+    music_length = max(0.0, min(crop_duration, music_duration - trim_start))
+    
+    music_filters = [
+        f"atrim=start={trim_start}:duration={crop_duration}",
+        "asetpts=PTS-STARTPTS"
+    ]
+    if fade_in_duration > 0:
+        music_filters.append(f"afade=t=in:st=0:d={fade_in_duration}")
+    # Without a fade out, a very short one still stops the cut into the bell from clicking
+    fade_out_duration = max(fade_out_duration, SPLICE_FADE_DURATION)
+    fade_out_start = max(0.0, music_length - fade_out_duration)
+    music_filters.append(f"afade=t=out:st={fade_out_start}:d={fade_out_duration}")
+    music_filters.append(OUTPUT_AUDIO_FORMAT)
+    
+    # Both parts must share one sample format before they can be concatenated
+    filter_graph = (
+        f"[0:a]{','.join(music_filters)}[music];"
+        f"[1:a]{OUTPUT_AUDIO_FORMAT}[bell];"
+        "[music][bell]concat=n=2:v=0:a=1"
+    )
+    if include_algo_copy:
+        # Split the result so the Bell System copy is encoded in the same pass
+        return f"{filter_graph}[joined];[joined]asplit=2[out][algo]"
+    return f"{filter_graph}[out]"
+
+def can_copy_streams(music_info, bell_info, crop_duration):
+    """Check if the files can be joined as-is, without decoding and re-encoding"""
+    # Music longer than the crop length needs the decoded samples
+    if music_info["codec_name"] != "mp3" or music_info["duration"] > crop_duration:
+        return False
+    
+    # MP3 frames can only be joined when both files use the same stream layout
+    return (bell_info["codec_name"] == "mp3" and
+            bell_info["sample_rate"] == music_info["sample_rate"] and
+            bell_info["channels"] == music_info["channels"])
+
+def run_in_parallel(*tasks):
+    """Run independent tasks on separate threads and return their results in order"""
+    # The tasks wait on FFmpeg/FFprobe subprocesses, so the threads do not contend for the GIL
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = [executor.submit(task) for task in tasks]
+        return [future.result() for future in futures]
+
+def concat_mp3_files(music_data, bell_data, bell_file_path):
+    """Join two compatible MP3 files frame by frame without re-encoding"""
+    # The concat demuxer can only read its inputs from files listed in a text file
+    temp_file_paths = []
+    try:
+        input_paths = []
+        for data in (music_data, bell_data):
+            if data is None:
+                # Library bells are already on disk
+                input_paths.append(bell_file_path)
+                continue
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as input_file:
+                temp_file_paths.append(input_file.name)
+                input_file.write(data)
+            input_paths.append(input_file.name)
+        
+        with tempfile.NamedTemporaryFile("w", delete=False, suffix=".txt") as list_file:
+            temp_file_paths.append(list_file.name)
+            for file_path in input_paths:
+                escaped_path = os.path.abspath(file_path).replace("'", "'\\''")
+                list_file.write(f"file '{escaped_path}'\n")
+        
+        return run_ffmpeg([
+            find_binary("ffmpeg"), "-v", "error",
+            "-f", "concat", "-safe", "0",
+            "-i", list_file.name,
+            "-map", "0:a",
+            "-c", "copy",
+            "-f", "mp3", "pipe:1"
+        ])
+    finally:
+        for temp_file_path in temp_file_paths:
+            os.unlink(temp_file_path)
+
+def encode_combined_audio(music_data, bell_input, filter_graph, algo_output_path=None, pass_fds=()):
+    """Trim, crop, fade, append the bell and encode to MP3 in a single FFmpeg pass"""
+    args = [
+        find_binary("ffmpeg"), "-v", "error", "-y",
+        "-i", "pipe:0",
+        "-i", bell_input,
+        "-filter_complex", filter_graph,
+        "-map", "[out]",
+        *MP3_ENCODER_ARGS,
+        "-f", "mp3", "pipe:1"
+    ]
+    if algo_output_path is not None:
+        # Mono copy for the Bell System, written to a file as stdout carries the main output
+        args += ["-map", "[algo]", "-ac", "1", *MP3_ENCODER_ARGS, "-f", "mp3", algo_output_path]
+    return run_ffmpeg(args, music_data, pass_fds)
+
+def hash_data(data):
+    """Get a short content hash used in output cache keys"""
+    # hashlib picks up the CPU's SHA extensions where available, so hashing costs far less than processing
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def get_upload_hash(uploaded_file):
+    """Hash an uploaded file once and reuse the hash on later reruns"""
+    # file_id changes with every upload, even when name and size stay the same
+    cache_key = f"hash_{uploaded_file.file_id}"
+    if cache_key not in st.session_state:
+        st.session_state[cache_key] = hash_data(uploaded_file.getvalue())
+    return st.session_state[cache_key]
+
+def get_output_cache_path(music_hash, bell_hash, crop_duration, fade_out_duration, trim_start, fade_in_duration):
+    """Get the cache file path for the output of these input files and settings"""
+    cache_key = "_".join([
+        music_hash,
+        bell_hash,
+        f"{crop_duration}_{fade_out_duration}_{trim_start}_{fade_in_duration}"
+    ])
+    return os.path.join(CACHE_DIR, f"{cache_key}.mp3")
+
+def process_audio_files(music_data, bell_data, bell_file_path, report_progress, crop_duration=180, fade_out_duration=2.0, trim_start=0, fade_in_duration=0.0, include_algo_copy=False):
     """Process the two audio files according to requirements"""
+    # The music and an uploaded bell arrive as the uploads' bytes; a library bell only has a path (bell_data is None)
     try:
-        # Update progress
-        progress_bar.progress(10)
-        status_text.text("Loading first audio file...")
-        
-        # Load first audio file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file1_name.split('.')[-1]}") as tmp1:
-            tmp1.write(file1_data)
-            tmp1.flush()
-            audio1 = AudioSegment.from_file(tmp1.name)
-        
-        progress_bar.progress(25)
-        status_text.text("Loading bell audio file...")
-        
-        # Load second audio file (bell file)
-        if is_file2_from_library:
-            # Load directly from bell files directory
-            bell_file_path = os.path.join(BELL_FILES_DIR, file2_name)
-            audio2 = AudioSegment.from_file(bell_file_path)
-            tmp2 = None  # No temp file needed
-        else:
-            # Load from uploaded file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file2_name.split('.')[-1]}") as tmp2:
-                tmp2.write(file2_data)
-                tmp2.flush()
-                audio2 = AudioSegment.from_file(tmp2.name)
-        
-        progress_bar.progress(40)
-        
-        # Trim start if specified
-        if trim_start > 0:
-            status_text.text(f"Trimming first {trim_start} seconds from start...")
-            trim_start_ms = int(trim_start * 1000)
-            audio1 = audio1[trim_start_ms:]
-        
-        status_text.text(f"Cropping music file to {crop_duration} seconds...")
-        
-        # Crop first audio to specified duration
-        crop_duration_ms = int(crop_duration * 1000)  # Convert to milliseconds as integer
-        if len(audio1) > crop_duration_ms:
-            audio1_cropped = audio1[:crop_duration_ms]
-        else:
-            audio1_cropped = audio1
-        
-        progress_bar.progress(55)
-        
-        # Apply fade in effect if specified
-        if fade_in_duration > 0:
-            status_text.text(f"Applying {fade_in_duration} second fade in effect...")
-            fade_in_duration_ms = int(fade_in_duration * 1000)
-            audio1_cropped = audio1_cropped.fade_in(fade_in_duration_ms)
-        
-        status_text.text(f"Applying {fade_out_duration} second fade out effect...")
-        
-        # Apply fade out effect with specified duration
-        fade_out_duration_ms = int(fade_out_duration * 1000)  # Convert to milliseconds as integer
-        audio1_with_fade = audio1_cropped.fade_out(fade_out_duration_ms)
-        
-        progress_bar.progress(70)
-        status_text.text("Combining audio files...")
-        
-        # Append second audio to the processed first audio
-        combined_audio = audio1_with_fade + audio2
-        
-        progress_bar.progress(85)
-        status_text.text("Converting to MP3 format...")
+        # The music is piped to FFprobe and FFmpeg straight from the upload's bytes
+        probe_music = partial(probe_audio_file, "pipe:0", music_data)
+        music_info = None
+        if bell_file_path is not None:
+            # One stat identifies the version of the library bell for its cached probe and decoded copy
+            bell_stat = os.stat(bell_file_path)
+        
+        # Nothing to trim or fade: probe both files together to see if they can be joined without re-encoding
+        if trim_start == 0 and fade_in_duration == 0 and fade_out_duration == 0:
+            if bell_file_path is not None:
+                probe_bell = partial(probe_library_bell, bell_file_path, bell_stat.st_mtime_ns, bell_stat.st_size)
+            else:
+                probe_bell = partial(probe_audio_file, "pipe:0", bell_data)
+            music_info, bell_info = run_in_parallel(probe_music, probe_bell)
+            
+            if can_copy_streams(music_info, bell_info, crop_duration):
+                report_progress(40, "Joining MP3 files...")
+                
+                # Nothing is encoded here, so a Bell System copy is converted on upload instead
+                output_data = concat_mp3_files(music_data, bell_data, bell_file_path)
+                return output_data, None, None
+        
+        if bell_file_path is not None:
+            # Decode the library bell (or fetch its cached decoded copy) while the music is probed
+            load_bell = partial(load_bell_file, bell_file_path, bell_stat.st_mtime_ns, bell_stat.st_size)
+            if music_info is None:
+                music_info, decoded_bell_path = run_in_parallel(probe_music, load_bell)
+            else:
+                decoded_bell_path = load_bell()
+        elif music_info is None:
+            music_info = probe_music()
         
-        # Export as MP3
-        output_buffer = io.BytesIO()
-        combined_audio.export(output_buffer, format="mp3", bitrate="192k")
-        output_buffer.seek(0)
+        filter_graph = build_filter_graph(music_info["duration"], crop_duration, fade_out_duration, trim_start, fade_in_duration, include_algo_copy)
         
-        progress_bar.progress(100)
-        status_text.text("Processing complete!")
+        report_progress(40, "Trimming, fading, combining and converting to MP3 format...")
         
-        # Clean up temporary files
+        algo_output_path = None
+        if include_algo_copy:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as algo_file:
+                algo_output_path = algo_file.name
         try:
-            os.unlink(tmp1.name)
-            if tmp2 is not None:
-                os.unlink(tmp2.name)
-        except:
-            pass  # Ignore cleanup errors
+            if bell_file_path is not None:
+                output_data = encode_combined_audio(music_data, decoded_bell_path, filter_graph, algo_output_path)
+            else:
+                # stdin carries the music, so an uploaded bell gets a pipe of its own
+                with pipe_input(bell_data) as bell_fd:
+                    output_data = encode_combined_audio(music_data, f"pipe:{bell_fd}", filter_graph, algo_output_path, pass_fds=(bell_fd,))
+            
+            algo_data = None
+            if algo_output_path is not None:
+                with open(algo_output_path, "rb") as f:
+                    algo_data = f.read()
+        finally:
+            if algo_output_path is not None:
+                os.unlink(algo_output_path)
         
-        return output_buffer.getvalue(), combined_audio, None
+        return output_data, algo_data, None
         
     except Exception as e:
-        # Clean up temporary files in case of error
-        try:
-            if 'tmp1' in locals() and tmp1:
-                os.unlink(tmp1.name)
-            if 'tmp2' in locals() and tmp2 is not None:
-                os.unlink(tmp2.name)
-        except:
-            pass
-        
         return None, None, f"Error processing audio files: {str(e)}"
 
+@st.cache_resource
+def get_processing_executor():
+    """Get the thread pool shared by all sessions for audio processing"""
+    return ThreadPoolExecutor(max_workers=os.cpu_count())
+
+def write_cache_file(cache_path, data):
+    """Write a cache file so that other sessions never see it half written"""
+    # Each writer gets its own partial file, so sessions writing the same output don't collide
+    partial_file = tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix=".partial", delete=False)
+    try:
+        with partial_file:
+            partial_file.write(data)
+        os.replace(partial_file.name, cache_path)
+    except OSError:
+        # Don't leave a half-written file behind, e.g. when the disk is full
+        os.remove(partial_file.name)
+        raise
+
+def read_cache_file(cache_path):
+    """Read a cached output, or return None if it isn't cached"""
+    try:
+        with open(cache_path, "rb") as f:
+            data = f.read()
+        # Mark it as recently used so pruning removes it last
+        os.utime(cache_path)
+        return data
+    except OSError:
+        return None
+
+def prune_cache():
+    """Remove the least recently used outputs until the cache fits in MAX_CACHE_BYTES"""
+    cached_files = []
+    with os.scandir(CACHE_DIR) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(".mp3"):
+                stat = entry.stat()
+                cached_files.append((stat.st_mtime, stat.st_size, entry.path))
+    cache_size = sum(size for _, size, _ in cached_files)
+    for _, size, path in sorted(cached_files):
+        if cache_size <= MAX_CACHE_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Another session pruned it first
+        cache_size -= size
+
+def get_algo_cache_path(output_cache_path):
+    """Get the cache file path for the Bell System copy of a cached output"""
+    return f"{os.path.splitext(output_cache_path)[0]}.algo.mp3"
+
+def run_processing_job(output_cache_path, progress, music_data, bell_data, bell_file_path, *settings):
+    """Process the audio files on a worker thread and cache the output"""
+    def report_progress(percent, message):
+        progress["percent"] = percent
+        progress["message"] = message
+    
+    processed_data, algo_data, error = process_audio_files(music_data, bell_data, bell_file_path, report_progress, *settings)
+    # The cache only saves work on later runs, so failing to write it must not lose this result
+    try:
+        if processed_data is not None:
+            write_cache_file(output_cache_path, processed_data)
+        if algo_data is not None:
+            write_cache_file(get_algo_cache_path(output_cache_path), algo_data)
+        prune_cache()
+    except OSError:
+        pass
+    return processed_data, algo_data, error
+
+@st.fragment(run_every=0.5)
+def show_processing_progress():
+    """Show the progress of the background processing job until it finishes"""
+    processing_job = st.session_state['processing_job']
+    if not processing_job.done():
+        progress = st.session_state['processing_progress']
+        st.progress(progress["percent"])
+        st.text(progress["message"])
+        return
+    
+    # Drop the finished job first, so a job that raised can't keep failing here and disabling the Process button
+    del st.session_state['processing_job']
+    try:
+        processed_data, algo_data, error = processing_job.result()
+    except Exception as e:
+        processed_data, algo_data, error = None, None, f"Error processing audio files: {str(e)}"
+    if error:
+        st.session_state['processing_error'] = error
+    else:
+        # Store processed audio in session state for buttons
+        st.session_state['processed_data'] = processed_data
+        st.session_state['processed_algo_data'] = algo_data
+        st.session_state['processing_complete'] = True
+        st.session_state['processing_succeeded'] = True
+    
+    # Rerun the whole page to show the result
+    st.rerun()
+
 def main():
     st.title("🔔 Bell Music Creator")
     st.markdown("Upload your music file and select the required bell to automatically create the required bell audio file for the bell system.")
@@ -231,7 +664,7 @@ def main():
            - Trim the start of the music file (optional)
            - Crop the music file to your specified duration
            - Add fade in effect (optional)
-           - Add fade out effect with your chosen duration
+           - Add fade out effect with your chosen duration (optional)
            - Append the selected bell file to the processed music file
            - Convert the result to MP3 format
         5. **Download** your processed audio file with automatic naming
@@ -255,9 +688,11 @@ def main():
         )
         
         if uploaded_file1:
-            is_valid1, message1 = validate_audio_file(uploaded_file1)
+            is_valid1, message1 = get_validation_result(uploaded_file1)
             if is_valid1:
                 st.success(f"✅ {uploaded_file1.name} loaded successfully")
+                # Hash the upload once now so Process can check the output cache straight away
+                get_upload_hash(uploaded_file1)
             else:
                 st.error(f"❌ {message1}")
     
@@ -332,7 +767,7 @@ def main():
         st.write("**Fade out duration**")
         fade_out_duration = st.number_input(
             "Seconds",
-            min_value=0.5,
+            min_value=0.0,
             max_value=10.0,
             value=3.0,
             step=0.5,
@@ -348,7 +783,8 @@ def main():
         caption_parts.append(f"crop to {crop_duration}s")
         if fade_in_duration > 0:
             caption_parts.append(f"{fade_in_duration}s fade in")
-        caption_parts.append(f"{fade_out_duration}s fade out")
+        if fade_out_duration > 0:
+            caption_parts.append(f"{fade_out_duration}s fade out")
         st.caption(f"Processing: {', '.join(caption_parts)}")
     
     st.markdown("---")
@@ -356,7 +792,7 @@ def main():
         st.write("**Choose Bell File**")
         
         # Get available bell files
-        available_bells = get_available_bell_files()
+        available_bells = get_available_bell_files(os.path.getmtime(BELL_FILES_DIR))
         bell_options = available_bells + ["Upload new bell file..."]
         
         selected_bell = st.selectbox(
@@ -368,7 +804,7 @@ def main():
         
         uploaded_file2 = None
         bell_file_name = None
-        bell_file_data = None
+        bell_stat = None
         is_from_library = False
         
         if selected_bell == "Upload new bell file...":
@@ -380,7 +816,7 @@ def main():
             )
             
             if uploaded_file2:
-                is_valid2, message2 = validate_audio_file(uploaded_file2)
+                is_valid2, message2 = get_validation_result(uploaded_file2)
                 if is_valid2:
                     st.success(f"✅ {uploaded_file2.name} loaded successfully")
                     
@@ -391,26 +827,27 @@ def main():
                         st.rerun()
                     
                     bell_file_name = uploaded_file2.name
-                    bell_file_data = uploaded_file2.getvalue()
                 else:
                     st.error(f"❌ {message2}")
         else:
             # Using existing bell file
             if selected_bell:
                 bell_file_path = os.path.join(BELL_FILES_DIR, selected_bell)
-                if os.path.exists(bell_file_path):
+                try:
+                    # One stat both checks the file exists and identifies its version for the output cache
+                    bell_stat = os.stat(bell_file_path)
                     bell_file_name = selected_bell
                     is_from_library = True
+                except FileNotFoundError:
+                    pass
     
     # Check if we have both music file and bell file ready
     has_music_file = uploaded_file1 is not None
     has_bell_file = (bell_file_name is not None and 
-                     (is_from_library or bell_file_data is not None))
+                     (is_from_library or uploaded_file2 is not None))
     
     if has_music_file and has_bell_file:
-        # Validate music file
-        is_valid1, message1 = validate_audio_file(uploaded_file1)
-        
+        # Music file was validated when it was uploaded above
         if is_valid1:
             # Filename customization
             st.subheader("📝 Output File Name")
@@ -436,11 +873,7 @@ def main():
                     help="The file will be saved as MP3 format"
                 )
                 
-                # Ensure .mp3 extension
-                if not custom_filename.endswith('.mp3'):
-                    final_filename = f"{custom_filename}.mp3"
-                else:
-                    final_filename = custom_filename
+                final_filename = make_output_filename(custom_filename)
             else:
                 # Extract week number from selection (e.g., "Week 1 Bell" -> 1)
                 week_num = selected_option.split()[1]
@@ -448,42 +881,58 @@ def main():
                 
             st.info(f"Output file name: **{final_filename}**")
             
-            if st.button("🎵 Process Audio Files", type="primary", use_container_width=True):
-                # Create progress indicators
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                # Process the files
-                processed_data, audio_segment, error = process_audio_files(
-                    uploaded_file1.getvalue(),
-                    bell_file_data,
-                    uploaded_file1.name,
-                    bell_file_name,
-                    progress_bar,
-                    status_text,
-                    is_from_library,
-                    crop_duration,
-                    fade_out_duration,
-                    trim_start,
-                    fade_in_duration
-                )
-                
-                if error:
-                    st.error(f"❌ Processing failed: {error}")
-                    progress_bar.empty()
-                    status_text.empty()
+            is_processing = 'processing_job' in st.session_state
+            if st.button("🎵 Process Audio Files", type="primary", use_container_width=True, disabled=is_processing):
+                # getvalue() returns the upload's own bytes; getbuffer() would copy them out of the shared BytesIO
+                music_data = uploaded_file1.getvalue()
+                if is_from_library:
+                    # Library bells are identified by path, size and modification time instead of their content
+                    bell_data = None
+                    bell_file_path = os.path.join(BELL_FILES_DIR, bell_file_name)
+                    bell_hash = hash_data(f"{bell_file_path}:{bell_stat.st_size}:{bell_stat.st_mtime_ns}".encode())
                 else:
-                    st.success("✅ Audio processing completed successfully!")
-                    
-                    # Store audio segment in session state for buttons
-                    st.session_state['processed_audio_segment'] = audio_segment
-                    st.session_state['processed_filename'] = final_filename
-                    st.session_state['processed_data'] = processed_data
+                    bell_data = uploaded_file2.getvalue()
+                    bell_file_path = None
+                    bell_hash = get_upload_hash(uploaded_file2)
+                
+                st.session_state['processed_filename'] = final_filename
+                output_cache_path = get_output_cache_path(get_upload_hash(uploaded_file1), bell_hash, crop_duration, fade_out_duration, trim_start, fade_in_duration)
+                cached_data = read_cache_file(output_cache_path)
+                if cached_data is not None:
+                    # Same files and settings as an earlier run: reuse its output
+                    st.session_state['processed_data'] = cached_data
+                    st.session_state['processed_algo_data'] = read_cache_file(get_algo_cache_path(output_cache_path))
                     st.session_state['processing_complete'] = True
-                    
-                    # Clear progress indicators
-                    progress_bar.empty()
-                    status_text.empty()
+                    st.session_state['processing_succeeded'] = True
+                else:
+                    # Process the files in the background
+                    # Progress is only reported at the start and before encoding: FFmpeg gives no finer steps
+                    progress = {"percent": 10, "message": "Reading music file details..."}
+                    st.session_state['processing_progress'] = progress
+                    st.session_state['processing_job'] = get_processing_executor().submit(
+                        run_processing_job,
+                        output_cache_path,
+                        progress,
+                        music_data,
+                        bell_data,
+                        bell_file_path,
+                        crop_duration,
+                        fade_out_duration,
+                        trim_start,
+                        fade_in_duration,
+                        # Encode the mono Bell System copy in the same pass when it can be uploaded
+                        is_algo_upload_configured(load_algo_config())
+                    )
+                    st.session_state['processing_complete'] = False
+            
+            # Poll the background job while it is running
+            if 'processing_job' in st.session_state:
+                show_processing_progress()
+            
+            if 'processing_error' in st.session_state:
+                st.error(f"❌ Processing failed: {st.session_state.pop('processing_error')}")
+            elif st.session_state.pop('processing_succeeded', False):
+                st.success("✅ Audio processing completed successfully!")
             
             # Show buttons if processing is complete (outside the button handler)
             if st.session_state.get('processing_complete', False):
@@ -509,18 +958,13 @@ def main():
                 
                 with btn_col2:
                     # Upload to Bell System button (if configured in config file)
-                    is_enabled = algo_config.get('enabled', False)
-                    has_ip = bool(algo_config.get('device_ip', ''))
-                    has_password = bool(algo_config.get('password', ''))
-                    
-                    if is_enabled and has_ip and has_password:
+                    if is_algo_upload_configured(algo_config):
                         if st.button("📡 Upload to Bell System", type="primary", use_container_width=True, key="upload_btn"):
-                            with st.spinner("Converting and uploading to Bell System..."):
-                                # Convert to MP3 format
-                                mp3_data = convert_to_algo_mp3(
-                                    st.session_state['processed_audio_segment'],
-                                    st.session_state['processed_filename']
-                                )
+                            with st.spinner("Uploading to Bell System..."):
+                                # Use the mono copy made during processing, converting only if there is none
+                                mp3_data = st.session_state.get('processed_algo_data')
+                                if mp3_data is None:
+                                    mp3_data = convert_to_algo_mp3(st.session_state['processed_data'])
                                 
                                 # Upload to device
                                 success, message = upload_to_algo8301(
@@ -554,9 +998,9 @@ def main():
         - Trim start: Optional trimming from the beginning (0-600 seconds)
         - Music file: Cropped to your specified duration (10-600 seconds)
         - Fade in: Optional fade in effect (0-10 seconds) applied at the start
-        - Fade out: Customizable fade out duration (0.5-10 seconds) applied to end of music file
+        - Fade out: Optional fade out effect (0-10 seconds) applied to end of music file
         - Combination: Bell file appended seamlessly after fade
-        - Output: MP3 format at 192kbps bitrate
+        - Output: MP3 format at 192kbps bitrate (MP3 files that need no trimming, cropping or fading are joined without re-encoding)
         - Naming: Automatic naming as "MusicFileName_Bell.mp3" with option to customize
         
         **Requirements:** This application uses FFmpeg for audio processing.